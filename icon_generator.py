@@ -1,22 +1,92 @@
 """
 Multi-agent icon generator using agent delegation pattern.
 
-This application demonstrates pydantic-ai's agent delegation pattern by creating
-custom 128x128 icons. The parent agent (Icon Creator) delegates to a specialist
-agent (Style Expert) to refine prompts before generating the final icon.
+This application creates custom 128x128 icons with pydantic-ai. By default a
+single agent (Icon Designer) refines the prompt and generates the icon in one
+pass. With --two-agent it demonstrates the agent delegation pattern: the parent
+agent (Icon Creator) delegates to a specialist agent (Style Expert) to refine
+prompts before generating the final icon.
 """
 
 import argparse
 import asyncio
+import base64
+import hashlib
+import itertools
+import logging
 import re
+import shutil
+import sqlite3
+import time
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
 
 import httpx
-from openai import AsyncOpenAI
+from openai import APIConnectionError, AsyncOpenAI, RateLimitError
 from PIL import Image
 from pydantic_ai import Agent, RunContext
+from pydantic_ai.exceptions import ModelHTTPError
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+__all__ = ["create_icon", "IconRequest", "PromptCache"]
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_ICONS = 5
+DALL_E_2_MAX_PROMPT_LENGTH = 1000
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DALL_E_CDN_URL = "https://oaidalleapiprodscus.blob.core.windows.net/"
+
+_OUTPUT_DIR = Path.cwd() / "output"
+
+# Appended to filename timestamps so concurrent icons never collide.
+_icon_counter = itertools.count()
+
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w\s-]")
+_WS_RE = re.compile(r"\s+")
+
+_OPENAI: AsyncOpenAI | None = None
+_HTTP_CLIENT: httpx.AsyncClient | None = None
+
+
+def get_openai() -> AsyncOpenAI:
+    """Return the shared OpenAI client used for image generation."""
+    global _OPENAI
+    if _OPENAI is None:
+        _OPENAI = AsyncOpenAI(max_retries=5, timeout=httpx.Timeout(60.0, connect=5.0))
+    return _OPENAI
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client used to download generated images."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=100,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+    return _HTTP_CLIENT
+
+
+async def close_clients() -> None:
+    """Close the shared OpenAI and HTTP clients, if they were created."""
+    global _OPENAI, _HTTP_CLIENT
+    if _OPENAI is not None:
+        await _OPENAI.close()
+        _OPENAI = None
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
 
 
 @dataclass
@@ -26,18 +96,202 @@ class IconRequest:
     art_style: str
     description: str
     openai_client: AsyncOpenAI
+    cache: "PromptCache | None" = None
+    quality: str = "high"
+    index: int = 0
+    saved_filename: str | None = None
+
+
+def cache_key(*parts: str) -> str:
+    """Build an exact-match cache key from request fields (style, description, ...)."""
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
 
+def image_cache_key(art_style: str, description: str, quality: str, index: int) -> str:
+    """
+    Build the cache key for a generated icon.
+
+    The icon's index within a --count run is part of the key, so one run still
+    yields distinct icons while a repeated run reuses them one-for-one.
+    """
+    return cache_key(art_style, description, quality, str(index))
+
+
+class PromptCache:
+    """
+    Local SQLite cache of refined prompts and generated icons.
+
+    Both the Style Expert output and the generated image depend only on the
+    request arguments, so repeated runs with the same arguments can skip the
+    LLM and DALL-E calls entirely. Icons are looked up in create_icon before
+    any agent runs. Refined prompts only exist on the --two-agent path, where
+    consult_style_expert reads and writes them; the default single-agent path
+    never uses that tier.
+    """
+
+    def __init__(self, path: Path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                refined_prompt TEXT,
+                image_path TEXT,
+                created_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get_prompt(self, key: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT refined_prompt FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_prompt(self, key: str, refined_prompt: str) -> None:
+        self.conn.execute(
+            """
+            INSERT INTO cache (key, refined_prompt, created_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET refined_prompt = excluded.refined_prompt
+            """,
+            (key, refined_prompt, time.time()),
+        )
+        self.conn.commit()
+
+    def get_image(self, key: str) -> Path | None:
+        """Return the cached icon path, or None if missing or deleted from disk."""
+        row = self.conn.execute(
+            "SELECT image_path FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row[0] and Path(row[0]).is_file():
+            return Path(row[0])
+        return None
+
+    def put_image(self, key: str, image_path: Path) -> None:
+        self.conn.execute(
+            """
+            INSERT INTO cache (key, image_path, created_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET image_path = excluded.image_path
+            """,
+            (key, str(image_path), time.time()),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+STYLE_GUIDE = """
+General icon guidance:
+- Composition: one clear central subject, centered, filling roughly 70-80% of the
+  canvas with a small even margin. Avoid busy scenes, multiple competing subjects,
+  and fine details that disappear when downscaled to 128x128.
+- Silhouette: the subject must be recognizable from its outline alone. Favor bold,
+  simple shapes and strong contrast between subject and background.
+- Background: plain, softly graded, or transparent-looking. Never include a frame,
+  border, drop-shadowed card, or mock-up of a device or app screen.
+- Color: a limited palette of 3-6 harmonious colors appropriate to the style,
+  with one accent color to draw the eye.
+- Text: never include letters, words, numbers, logos, or watermarks.
+- Lighting: a single consistent light source; keep shading readable at small sizes.
+- Perspective: front-facing or three-quarter view unless the style dictates otherwise
+  (for example isometric).
+
+Style-specific techniques:
+- minimalist: very few shapes, generous negative space, flat color, no texture.
+- flat: solid color fills, no gradients or shadows, crisp geometric edges.
+- pixel art: visible square pixels on a coarse grid, limited retro palette, no
+  anti-aliasing, 8-bit or 16-bit game aesthetic.
+- line art: uniform stroke weight, clean outlines and contours, little or no fill.
+- vector: clean scalable shapes, smooth curves, precise edges, flat or lightly
+  graded fills.
+- gradient: smooth color transitions across the subject, modern glossy feel.
+- isometric: true isometric projection, geometric precision, consistent 30-degree
+  angles, subtle face shading to show depth.
+- watercolor: soft flowing washes, gentle color bleeding, visible paper texture,
+  loose organic edges.
+- sketch: hand-drawn pencil or ink look, rough construction lines, hatching.
+- woodcut: bold carved lines, high contrast, textured engraved appearance.
+- cartoon: exaggerated proportions, thick outlines, playful expressive shapes.
+- pop art: bold saturated colors, thick black outlines, halftone dots, comic feel.
+- art deco: symmetrical geometric shapes, metallic gold accents, luxurious detail.
+- gothic: dark palette, ornate intricate detailing, dramatic contrast.
+- steampunk: brass and copper tones, gears, rivets, Victorian mechanical details.
+- cyberpunk: neon magenta and cyan glow on dark backgrounds, futuristic tech details.
+- sci-fi: sleek futuristic forms, space themes, cool lighting.
+- fantasy: magical otherworldly elements, rich color, soft glow effects.
+- surrealist: dream-like, unexpected juxtapositions, smooth painterly rendering.
+- impressionist: visible brush strokes, emphasis on light and color over detail.
+- expressionist: emotional distorted forms, vivid non-naturalistic color.
+- cubist: fragmented geometric planes, multiple viewpoints, muted palette.
+- realistic: life-like proportions, detailed textures, natural lighting.
+- vintage: muted nostalgic palette, aged texture, retro print feel.
+- modern: sleek contemporary shapes, clean lines, restrained palette.
+For any style not listed, identify its defining visual traits and apply them in
+the same way, always prioritizing legibility at 128x128.
+
+Subject handling:
+- Animals and characters: show the whole figure or a clear head-and-shoulders view,
+  with a readable pose and, where it suits the style, a friendly expression. Give
+  them one distinctive feature (a fin, ears, a hat) that survives downscaling.
+- Objects and tools: show the object at a slight angle so its form is obvious,
+  isolated from any surrounding scene, with its most recognizable side facing out.
+- Actions: convey motion with pose and one or two simple motion cues (speed lines,
+  a tilt, a splash) rather than multiple frames or a busy environment.
+- Abstract ideas: pick one concrete, widely understood symbol for the idea (a
+  lightbulb for an idea, a shield for security) and render it in the style.
+- Food and plants: exaggerate shape and color slightly so they read instantly.
+- Places and buildings: reduce them to a single landmark-like silhouette.
+
+Prompt structure:
+1. Open with the subject and the art style in one sentence.
+2. Describe the composition: framing, viewpoint, and how much of the canvas the
+   subject fills.
+3. Describe the palette by naming the main colors and the accent color.
+4. Describe the rendering technique that defines the style (strokes, fills,
+   shading, texture).
+5. Describe the background.
+6. Close with the constraints: a square icon, legible at 128x128, no text.
+Keep the whole prompt to one paragraph of roughly 60-120 words. Use concrete
+visual language ("thick navy outline", "soft teal gradient") rather than vague
+adjectives ("beautiful", "amazing", "high quality").
+
+Avoid:
+- Photographic camera terms (lens, bokeh, depth of field) unless the style is
+  realistic.
+- Requests for multiple variations, sprite sheets, grids, or collages.
+- Mentions of resolution numbers other than the 128x128 target, or of file formats.
+- Trademarked characters, brand logos, real people, and copyrighted designs.
+- Gore, violence, or any content unsuitable for a general audience.
+- Thin hairlines, tiny patterns, and small secondary objects that turn to noise
+  when the image is reduced to icon size.
+
+Legibility checklist:
+- Would the subject still be recognizable as a 32x32 favicon?
+- Is there one focal point and clear contrast against the background?
+- Does the palette stay limited and consistent with the style?
+- Is the image free of text, borders, and mock-up framing?
+"""
+
+STYLE_EXPERT_PROMPT = (
+    """
+You are an expert in visual art styles and icon design.
+Your job is to turn a short icon brief into a single, detailed image-generation prompt
+that produces a high-quality 128x128 pixel icon.
+
+Workflow:
+1. ALWAYS call refine_prompt first. It returns the brief for this run: the requested
+   art style and a description of what the icon should depict.
+2. Write one prompt for that brief, following the guidance below.
+3. Reply with the prompt text only - no preamble, no headings, no commentary.
+"""
+    + STYLE_GUIDE
+)
 
 style_expert = Agent(
     "openai:gpt-4o",
-    system_prompt=(
-        """
-You are an expert in visual art styles and icon design.
-When given an art style and description, you create detailed, optimized prompts for generating high-quality icons.
-Focus on: composition, color palettes, visual elements, and style-specific techniques.
-Keep prompts concise but detailed, suitable for 128x128 icon generation.
-    """
-    ),
+    system_prompt=STYLE_EXPERT_PROMPT,
     deps_type=IconRequest,
 )
 
@@ -61,36 +315,119 @@ that best represent this style.
     return prompt
 
 
+ICON_CREATOR_PROMPT = (
+    """
+You are an icon creator that generates custom 128x128 icons.
+The art style and description for this run are supplied to your tools automatically;
+you never need to ask for them or repeat them.
+
+Your workflow is:
+1. First, call consult_style_expert to get a refined prompt.
+2. Then, IMMEDIATELY call generate_icon_image, passing the string returned by
+   consult_style_expert verbatim as the refined prompt, to create the actual icon file.
+3. Finally, reply with the message returned by generate_icon_image.
+
+Rules:
+- You must ALWAYS generate the actual image - never just describe it.
+- Call each tool exactly once per run.
+- Do not rewrite, summarize, or shorten the refined prompt.
+- Do not ask the user follow-up questions; the brief is always complete.
+
+For reference, the Style Expert writes refined prompts using the guidance below.
+It is provided so you understand what a refined prompt contains; never edit the
+refined prompt to apply it yourself.
+"""
+    + STYLE_GUIDE
+)
+
 icon_creator = Agent(
     "openai:gpt-4o",
-    system_prompt=(
-        "You are an icon creator that generates custom 128x128 icons. "
-        "Your workflow is: "
-        "1. First, call consult_style_expert to get a refined prompt. "
-        "2. Then, IMMEDIATELY call generate_icon_image with the refined prompt to create the actual icon file. "
-        "You must ALWAYS generate the actual image - never just describe it."
-    ),
+    system_prompt=ICON_CREATOR_PROMPT,
+    deps_type=IconRequest,
+)
+
+ICON_DESIGNER_PROMPT = (
+    """
+You are an icon designer that generates custom 128x128 icons in a single pass.
+The user message gives the art style and a description of what the icon should depict.
+
+Your workflow is:
+1. Write one detailed image-generation prompt for the brief, following the guidance
+   below. Do this in your head - do not show it to the user.
+2. IMMEDIATELY call generate_icon_image with that prompt to create the actual icon file.
+3. Finally, reply with the message returned by generate_icon_image.
+
+Rules:
+- You must ALWAYS generate the actual image - never just describe it.
+- Call generate_icon_image exactly once per run.
+- Do not ask the user follow-up questions; the brief is always complete.
+"""
+    + STYLE_GUIDE
+)
+
+icon_designer = Agent(
+    "openai:gpt-4o",
+    system_prompt=ICON_DESIGNER_PROMPT,
     deps_type=IconRequest,
 )
 
 
 @icon_creator.tool
-async def consult_style_expert(ctx: RunContext[IconRequest], prompt: str) -> str:
+async def consult_style_expert(ctx: RunContext[IconRequest]) -> str:
     """
     Delegate to the Style Expert agent to refine the icon prompt.
 
     This demonstrates the agent delegation pattern where the parent agent
     calls a specialized delegate agent through a tool.
     """
+    cache = ctx.deps.cache
+    key = cache_key(ctx.deps.art_style, ctx.deps.description)
+    if cache and (cached := cache.get_prompt(key)):
+        print("  Using cached refined prompt...")
+        return cached
+
     result = await style_expert.run(
-        f"Please refine this icon prompt: {prompt}",
+        "Refine the icon prompt for this brief.",
         deps=ctx.deps,
         usage=ctx.usage,
     )
 
-    print(f"[DEBUG]{result.output}")
+    logger.debug("refined prompt: %s", result.output)
+
+    if cache:
+        cache.put_prompt(key, result.output)
+
+    return result.output
+
+
+async def _warm_cdn_connection(http_client: httpx.AsyncClient) -> None:
+    """
+    Open a pooled connection to the DALL-E CDN while the image is generating.
+
+    The response itself is irrelevant; the TCP+TLS connection left in the
+    keepalive pool is reused by the real download.
+    """
+    try:
+        await http_client.head(DALL_E_CDN_URL, timeout=2.0)
+    except httpx.HTTPError:
+        pass
+
 
-    return f"Style expert's refined prompt: {result.output}"
+def _new_icon_path(art_style: str, description: str) -> Path:
+    """Build a unique output path for a new icon."""
+    safe_style = _WS_RE.sub("_", _UNSAFE_FILENAME_RE.sub("", art_style).strip())
+    safe_desc = _WS_RE.sub("_", _UNSAFE_FILENAME_RE.sub("", description)[:30].strip())
+    safe_timestamp = f"{time.monotonic_ns()}_{next(_icon_counter)}"
+    return _OUTPUT_DIR / f"icon_{safe_style}_{safe_desc}_{safe_timestamp}.png"
+
+
+def _process_and_save(image_buffer: BytesIO, filepath: Path) -> None:
+    """Decode, downscale to 128x128, and save an icon (runs in a worker thread)."""
+    with image_buffer, Image.open(image_buffer) as image:
+        image.load()
+        # Downscales are 2x or 8x, where a box average matches LANCZOS visually.
+        image.thumbnail((128, 128), Image.Resampling.BOX)
+        image.save(filepath, "PNG", optimize=True)
 
 
 @icon_creator.tool
@@ -98,82 +435,168 @@ async def generate_icon_image(ctx: RunContext[IconRequest], refined_prompt: str)
     """
     Generate the actual icon image using OpenAI's DALL-E API.
 
-    Downloads the generated image, resizes it to 128x128, and saves it to disk.
+    Fetches the generated image, resizes it to 128x128, and saves it to disk.
     """
     client = ctx.deps.openai_client
     art_style = ctx.deps.art_style
     description = ctx.deps.description
 
-    actual_prompt = refined_prompt
-    if "Style expert's refined prompt:" in refined_prompt:
-        actual_prompt = refined_prompt.split("Style expert's refined prompt:")[
-            -1
-        ].strip()
+    filepath = _new_icon_path(art_style, description)
+    filename = filepath.name
 
     print(f"  Generating image with DALL-E...")
-    response = await client.images.generate(
-        model="dall-e-3",
-        prompt=actual_prompt,
-        size="1024x1024",
-        quality="standard",
-        n=1,
-    )
-
-    image_url = response.data[0].url
+    if ctx.deps.quality == "fast":
+        # DALL-E 2 renders natively at 256x256, so far fewer pixels are
+        # generated, transferred and resampled per icon.
+        http_client = get_http_client()
+        warmup = asyncio.create_task(_warm_cdn_connection(http_client))
+        try:
+            response = await client.images.generate(
+                model="dall-e-2",
+                prompt=refined_prompt[:DALL_E_2_MAX_PROMPT_LENGTH],
+                size="256x256",
+                n=1,
+            )
+        finally:
+            await warmup
+
+        image_url = response.data[0].url
+
+        print(f"  Downloading image...")
+        image_buffer = BytesIO()
+        async with http_client.stream("GET", image_url) as img_response:
+            img_response.raise_for_status()
+            async for chunk in img_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                image_buffer.write(chunk)
+        image_buffer.seek(0)
+    else:
+        # Request the image inline to skip the separate download round-trip.
+        response = await client.images.generate(
+            model="dall-e-3",
+            prompt=refined_prompt,
+            size="1024x1024",
+            quality="standard",
+            response_format="b64_json",
+            n=1,
+        )
 
-    print(f"  Downloading image...")
-    async with httpx.AsyncClient() as http_client:
-        img_response = await http_client.get(image_url)
-        img_response.raise_for_status()
-        image_data = img_response.content
+        image_buffer = BytesIO(base64.b64decode(response.data[0].b64_json))
 
     print(f"  Resizing to 128x128...")
-    image = Image.open(BytesIO(image_data))
-    image = image.resize((128, 128), Image.Resampling.LANCZOS)
-
-    safe_style = re.sub(r"[^\w\s-]", "", art_style).strip().replace(" ", "_")
-    safe_desc = re.sub(r"[^\w\s-]", "", description)[:30].strip().replace(" ", "_")
-    safe_timestamp = asyncio.get_event_loop().time()
-    filename = f"icon_{safe_style}_{safe_desc}_{safe_timestamp}.png"
-    output_dir = "output"
-    filepath = Path.cwd() / output_dir / filename
-
-    image.save(filepath, "PNG")
+    await asyncio.to_thread(_process_and_save, image_buffer, filepath)
     print(f"  ✓ Saved to {filepath}")
+    ctx.deps.saved_filename = filename
+
+    if ctx.deps.cache:
+        key = image_cache_key(art_style, description, ctx.deps.quality, ctx.deps.index)
+        ctx.deps.cache.put_image(key, filepath)
 
     return f"Icon generated and saved to: {filename}"
 
 
+icon_designer.tool(generate_icon_image)
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """Return True for rate limits, timeouts and connection failures worth retrying."""
+    if isinstance(exc, ModelHTTPError):
+        return exc.status_code == 429
+    # APIConnectionError also covers APITimeoutError.
+    return isinstance(exc, (RateLimitError, APIConnectionError, httpx.TransportError))
+
+
+@retry(
+    retry=retry_if_exception(_is_transient_error),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(6),
+    reraise=True,
+)
+async def _run_icon_agent(agent: Agent, user_prompt: str, deps: IconRequest) -> str:
+    """
+    Run an icon agent, retrying the whole run on transient failures.
+
+    Once an attempt has saved an icon, later attempts return it instead of
+    running the agent again. A failure on the final LLM turn therefore never
+    pays for a second DALL-E image. Each attempt can still make one DALL-E
+    request, and the OpenAI client retries that request up to 5 times, so a
+    request that times out after DALL-E has rendered the image may still be
+    billed more than once.
+    """
+    if deps.saved_filename is not None:
+        return f"Icon generated and saved to: {deps.saved_filename}"
+
+    result = await agent.run(user_prompt, deps=deps)
+    return result.output
+
+
 async def create_icon(
-    art_style: str, description: str, openai_client: AsyncOpenAI
+    art_style: str,
+    description: str,
+    openai_client: AsyncOpenAI | None = None,
+    cache: PromptCache | None = None,
+    quality: str = "high",
+    two_agent: bool = False,
+    index: int = 0,
 ) -> str:
     """
-    Create a custom icon using agent delegation.
+    Create a custom icon.
+
+    By default a single Icon Designer agent writes the refined prompt and
+    generates the image in one pass. With two_agent=True the Icon Creator
+    delegates prompt refinement to the Style Expert, at the cost of an
+    extra LLM round-trip.
 
     Args:
         art_style: The artistic style for the icon (e.g., "minimalist", "pixel art", "watercolor")
         description: Single sentence describing what the icon should depict
-        openai_client: AsyncOpenAI client instance
+        openai_client: AsyncOpenAI client instance (defaults to the shared client)
+        cache: Optional local cache of refined prompts and generated icons
+        quality: "high" for DALL-E 3 at 1024x1024, "fast" for DALL-E 2 at 256x256
+        two_agent: Use the Icon Creator -> Style Expert delegation pipeline
+        index: Position of this icon within a batch, used for image caching
 
     Returns:
         Result message with icon details
     """
+    if cache:
+        key = image_cache_key(art_style, description, quality, index)
+        if cached_path := cache.get_image(key):
+            filepath = _new_icon_path(art_style, description)
+            shutil.copyfile(cached_path, filepath)
+            print(f"  ✓ Copied cached icon to {filepath}")
+            return f"Icon generated and saved to: {filepath.name}"
+
     deps = IconRequest(
-        art_style=art_style, description=description, openai_client=openai_client
+        art_style=art_style,
+        description=description,
+        openai_client=openai_client or get_openai(),
+        cache=cache,
+        quality=quality,
+        index=index,
     )
 
-    result = await icon_creator.run(
-        f"Create a {art_style} style icon: {description}",
-        deps=deps,
+    if two_agent:
+        return await _run_icon_agent(icon_creator, "Generate the icon now.", deps)
+
+    # The brief goes in the user message, after the static system prompt,
+    # so the cacheable prefix is unchanged.
+    return await _run_icon_agent(
+        icon_designer, f"Create a {art_style} style icon: {description}", deps
     )
 
-    return result.output
+
+def _positive_int(value: str) -> int:
+    """Parse a command-line integer that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
 
 async def main():
     """Generate custom icons using command-line arguments."""
     parser = argparse.ArgumentParser(
-        description="Generate custom icons using AI with multi-agent delegation"
+        description="Generate custom icons using AI, optionally with multi-agent delegation"
     )
     parser.add_argument(
         "--style",
@@ -189,31 +612,86 @@ async def main():
     )
     parser.add_argument(
         "--count",
-        type=int,
+        type=_positive_int,
         default=1,
         help="Number of icons to generate (default: 1)",
     )
+    parser.add_argument(
+        "--quality",
+        choices=["fast", "high"],
+        default="high",
+        help="'high' uses DALL-E 3 at 1024x1024, 'fast' uses DALL-E 2 at 256x256 (default: high)",
+    )
+    parser.add_argument(
+        "--two-agent",
+        action="store_true",
+        help="Delegate prompt refinement to a separate Style Expert agent",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore and do not update the local prompt/icon cache",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log debug output from this tool (e.g. refined prompts with --two-agent)",
+    )
 
     args = parser.parse_args()
 
-    output_dir = Path.cwd() / "output"
-    output_dir.mkdir(exist_ok=True)
+    # Only this module's logger goes to DEBUG; third-party libraries (Pillow,
+    # openai, httpx) stay at WARNING so they don't dump request payloads.
+    logging.basicConfig(level=logging.WARNING, format="[%(levelname)s] %(message)s")
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
 
-    client = AsyncOpenAI()
+    _OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    cache = None if args.no_cache else PromptCache(_OUTPUT_DIR / "cache.sqlite3")
 
     print(f"Generating {args.count} icon(s) in '{args.style}' style...")
     print(f"Description: {args.description}\n")
 
-    for i in range(args.count):
-        if args.count > 1:
-            print(f"[{i + 1}/{args.count}] Starting icon generation...")
-
-        result = await create_icon(
-            art_style=args.style,
-            description=args.description,
-            openai_client=client,
+    # Cap in-flight generations to stay within OpenAI rate limits.
+    semaphore = asyncio.Semaphore(min(args.count, MAX_CONCURRENT_ICONS))
+
+    async def generate_one(i: int) -> str:
+        async with semaphore:
+            if args.count > 1:
+                print(f"[{i + 1}/{args.count}] Starting icon generation...")
+
+            return await create_icon(
+                art_style=args.style,
+                description=args.description,
+                cache=cache,
+                quality=args.quality,
+                two_agent=args.two_agent,
+                index=i,
+            )
+
+    try:
+        # With return_exceptions, gather only returns once every icon has
+        # finished, so one failure neither discards the others nor lets the
+        # cache and clients close underneath them.
+        results = await asyncio.gather(
+            *(generate_one(i) for i in range(args.count)), return_exceptions=True
         )
-        print(f"{result}\n")
+    finally:
+        if cache:
+            cache.close()
+        await close_clients()
+
+    failures = 0
+    for i, result in enumerate(results):
+        if isinstance(result, BaseException):
+            failures += 1
+            print(f"[{i + 1}/{args.count}] Failed: {result!r}\n")
+        else:
+            print(f"{result}\n")
+
+    if failures:
+        raise SystemExit(f"{failures} of {args.count} icon(s) failed")
 
 
 if __name__ == "__main__":